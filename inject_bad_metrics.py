@@ -5,14 +5,17 @@ This creates metrics that exceed thresholds to trigger healing.
 """
 
 from google.cloud import bigquery
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 import os
 
+import numpy as np
+import pandas as pd
+
 PROJECT_ID = os.getenv("GCP_PROJECT_ID", "bnb-marathon-478505")
 DATASET_ID = os.getenv("BIGQUERY_DATASET", "bnb_autohealer")
 TABLE_ID = os.getenv("BIGQUERY_TABLE", "metrics")
 
-def inject_bad_metrics():
+def inject_bad_metrics(n_samples: int = 5):
     """Insert metrics that will trigger anomaly detection"""
     
     client = bigquery.Client(project=PROJECT_ID)
@@ -21,44 +24,49 @@ def inject_bad_metrics():
     # Current time
     now = datetime.now(timezone.utc)
     
-    # Create 5 bad metric samples over last 5 minutes
-    bad_metrics = []
-    for i in range(5):
-        timestamp = now - timedelta(minutes=4-i)  # 4, 3, 2, 1, 0 minutes ago
-        
-        metric = {
-            "timestamp": timestamp.isoformat(),
-            "service_id": "user-api",
-            "latency_ms": 1800 + (i * 100),  # 1800-2200ms (exceeds 1500ms threshold)
-            "kafka_lag": 8000 + (i * 500),   # 8000-10000 (exceeds 5000 threshold)
-            "status": "DEGRADED",
-            "error_rate": 0.08 + (i * 0.01), # 8-12% (exceeds 5% threshold)
-            "cpu_usage": 0.75 + (i * 0.02),  # 75-83%
-            "memory_usage": 0.70 + (i * 0.02), # 70-78%
-            "request_count": 1500 + (i * 100)
-        }
-        bad_metrics.append(metric)
+    # Build bad metric samples column-wise, one per minute ending now
+    i = np.arange(n_samples)
+    bad_metrics = pd.DataFrame({
+        "timestamp": pd.date_range(end=now, periods=n_samples, freq="1min"),
+        "service_id": "user-api",
+        "latency_ms": 1800.0 + 100.0 * i,                     # 1800ms+ (exceeds 1500ms threshold)
+        "kafka_lag": 8000 + 500 * i,                          # 8000+ (exceeds 5000 threshold)
+        "status": "DEGRADED",
+        "error_rate": np.minimum(0.08 + 0.01 * i, 1.0),       # 8%+ (exceeds 5% threshold)
+        "cpu_usage": np.minimum(0.75 + 0.02 * i, 1.0),        # 75%+
+        "memory_usage": np.minimum(0.70 + 0.02 * i, 1.0),     # 70%+
+        "request_count": 1500 + 100 * i
+    })
     
     # Insert into BigQuery
     print(f"🔧 Injecting {len(bad_metrics)} bad metrics into BigQuery...")
     print(f"   Table: {table_ref}")
     print()
     
-    errors = client.insert_rows_json(table_ref, bad_metrics)
+    # Parquet load job instead of streaming insert: free, atomic, no duplicate
+    # rows on retry, and the DataFrame columns upload without per-row JSON
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+    )
+    load_job = client.load_table_from_dataframe(bad_metrics, table_ref, job_config=job_config)
+    load_job.result()
     
-    if errors:
+    if load_job.errors:
         print("❌ Errors occurred:")
-        for error in errors:
+        for error in load_job.errors:
             print(f"   {error}")
         return False
     else:
         print("✅ Bad metrics injected successfully!")
         print()
         print("📊 Metrics summary:")
-        for i, metric in enumerate(bad_metrics, 1):
-            print(f"   Sample {i}: latency={metric['latency_ms']}ms, "
-                  f"kafka_lag={metric['kafka_lag']}, "
-                  f"error_rate={metric['error_rate']:.1%}")
+        for i, metric in enumerate(bad_metrics.head(10).itertuples(), 1):
+            print(f"   Sample {i}: latency={metric.latency_ms}ms, "
+                  f"kafka_lag={metric.kafka_lag}, "
+                  f"error_rate={metric.error_rate:.1%}")
+        if len(bad_metrics) > 10:
+            print(f"   ... and {len(bad_metrics) - 10} more")
         print()
         print("🎯 Thresholds:")
         print("   • Latency: >1500ms (CRITICAL)")
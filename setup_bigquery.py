@@ -20,6 +20,7 @@ from google.api_core import exceptions
 PROJECT_ID = os.getenv("GCP_PROJECT_ID", "your-project-id")
 DATASET_ID = "bnb_autohealer"
 TABLE_ID = "metrics"
+ROLLUP_ID = f"{TABLE_ID}_rollup_1m"
 LOCATION = "US"  # Multi-region for high availability
 
 
@@ -45,8 +46,9 @@ def create_metrics_table(client: bigquery.Client) -> None:
     table_ref = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
     
     try:
-        client.get_table(table_ref)
+        table = client.get_table(table_ref)
         print(f"✅ Table {table_ref} already exists")
+        check_partitioning(table)
     except exceptions.NotFound:
         # Define schema
         # GCP Database +2: Time-series partitioned table for efficient queries
@@ -80,6 +82,10 @@ def create_metrics_table(client: bigquery.Client) -> None:
             field="timestamp",
         )
         
+        # Reject queries without a timestamp predicate instead of letting
+        # them scan every partition
+        table.require_partition_filter = True
+        
         # Cluster by service_id for efficient filtering
         table.clustering_fields = ["service_id"]
         
@@ -87,56 +93,127 @@ def create_metrics_table(client: bigquery.Client) -> None:
         print(f"✅ Created table {table_ref} with partitioning and clustering")
 
 
+def create_rollup_view(client: bigquery.Client) -> None:
+    """Create the 1-minute rollup used by detect_anomaly.
+    
+    A materialized view rather than a scheduled query: BigQuery refreshes it
+    incrementally and merges any not-yet-refreshed rows from the base table
+    at query time, so reads are never stale. Sums and counts (not averages)
+    are stored so any window of buckets re-aggregates exactly.
+    """
+    table_ref = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
+    rollup_ref = f"{PROJECT_ID}.{DATASET_ID}.{ROLLUP_ID}"
+    
+    ddl = f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS `{rollup_ref}`
+    PARTITION BY DATE(bucket_ts)
+    CLUSTER BY service_id
+    OPTIONS (enable_refresh = TRUE, refresh_interval_minutes = 1)
+    AS
+    SELECT
+        service_id,
+        TIMESTAMP_TRUNC(timestamp, MINUTE) AS bucket_ts,
+        COUNT(*) AS sample_count,
+        SUM(latency_ms) AS sum_latency_ms,
+        MAX(latency_ms) AS max_latency_ms,
+        COUNT(kafka_lag) AS kafka_lag_count,
+        SUM(kafka_lag) AS sum_kafka_lag,
+        MAX(kafka_lag) AS max_kafka_lag,
+        COUNT(error_rate) AS error_rate_count,
+        SUM(error_rate) AS sum_error_rate,
+        COUNTIF(status = 'DEGRADED') AS degraded_count,
+        COUNTIF(status = 'CRITICAL') AS critical_count
+    FROM `{table_ref}`
+    GROUP BY service_id, bucket_ts
+    """
+    
+    client.query(ddl).result()
+    print(f"✅ Rollup view {rollup_ref} ready (refreshes every minute)")
+
+
+def check_partitioning(table: bigquery.Table) -> None:
+    """Warn if an existing metrics table is not partitioned on timestamp.
+    
+    Tables created before partitioning was added to this script make every
+    detect_anomaly query scan the whole table (and trip its bytes-billed
+    guardrail). Partitioning can't be added in place, so print the DDL that
+    rebuilds the table instead of running it unasked.
+    """
+    table_ref = f"{table.project}.{table.dataset_id}.{table.table_id}"
+    partitioning = table.time_partitioning
+    if partitioning is not None and partitioning.field == "timestamp":
+        if not table.require_partition_filter:
+            print(f"⚠️  Table {table_ref} allows queries without a partition filter")
+            print("   Require one with:")
+            print(f"""
+    ALTER TABLE `{table_ref}` SET OPTIONS (require_partition_filter = TRUE);
+    """)
+        return
+    
+    print(f"⚠️  Table {table_ref} is not partitioned on timestamp")
+    print("   Rebuild it with partitioning and clustering:")
+    print(f"""
+    CREATE TABLE `{table_ref}_partitioned`
+    PARTITION BY DATE(timestamp)
+    CLUSTER BY service_id
+    OPTIONS (require_partition_filter = TRUE)
+    AS SELECT * FROM `{table_ref}`;
+    
+    DROP TABLE `{table_ref}`;
+    ALTER TABLE `{table_ref}_partitioned` RENAME TO {table.table_id};
+    """)
+
+
 def insert_mock_data(client: bigquery.Client) -> None:
     """Insert mock metric data for testing."""
     from datetime import datetime, timedelta
-    import random
+    import numpy as np
     
     table_ref = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
     
-    # Generate 100+ mock entries
-    rows = []
+    # Generate 100+ mock entries, one 30s sample each over the last 60 minutes
+    num_rows = 120
     services = ["user-api", "payment-service", "notification-service", "order-service"]
-    
-    # Generate data for last 60 minutes
     base_time = datetime.utcnow() - timedelta(minutes=60)
     
-    for i in range(120):
-        timestamp = base_time + timedelta(minutes=i * 0.5)
-        service = random.choice(services)
-        
-        # Normal operation most of the time
-        if random.random() < 0.85:
-            latency = random.uniform(50, 200)
-            kafka_lag = random.randint(0, 1000)
-            error_rate = random.uniform(0, 0.02)
-            status = "OK"
-        else:
-            # Anomaly spike
-            latency = random.uniform(800, 2500)
-            kafka_lag = random.randint(5000, 15000)
-            error_rate = random.uniform(0.05, 0.15)
-            status = "DEGRADED" if latency < 2000 else "CRITICAL"
-        
-        rows.append({
-            "timestamp": timestamp.isoformat(),
-            "service_id": service,
-            "latency_ms": latency,
-            "kafka_lag": kafka_lag,
-            "status": status,
-            "error_rate": error_rate,
-            "cpu_usage": random.uniform(0.2, 0.9),
-            "memory_usage": random.uniform(0.3, 0.8),
-            "request_count": random.randint(50, 500)
-        })
-    
-    # Insert data
-    errors = client.insert_rows_json(table_ref, rows)
-    
-    if errors:
-        print(f"❌ Errors inserting mock data: {errors}")
+    # Each column is drawn in one vectorized call instead of per row
+    rng = np.random.default_rng()
+    
+    # Normal operation most of the time, anomaly spikes otherwise
+    is_anomaly = rng.random(num_rows) >= 0.85
+    latency = np.where(is_anomaly, rng.uniform(800, 2500, num_rows), rng.uniform(50, 200, num_rows))
+    kafka_lag = np.where(is_anomaly, rng.integers(5000, 15001, num_rows), rng.integers(0, 1001, num_rows))
+    error_rate = np.where(is_anomaly, rng.uniform(0.05, 0.15, num_rows), rng.uniform(0, 0.02, num_rows))
+    status = np.where(is_anomaly, np.where(latency < 2000, "DEGRADED", "CRITICAL"), "OK")
+    
+    columns = {
+        "timestamp": [(base_time + timedelta(seconds=30 * i)).isoformat() for i in range(num_rows)],
+        "service_id": rng.choice(services, num_rows).tolist(),
+        "latency_ms": latency.tolist(),
+        "kafka_lag": kafka_lag.tolist(),
+        "status": status.tolist(),
+        "error_rate": error_rate.tolist(),
+        "cpu_usage": rng.uniform(0.2, 0.9, num_rows).tolist(),
+        "memory_usage": rng.uniform(0.3, 0.8, num_rows).tolist(),
+        "request_count": rng.integers(50, 501, num_rows).tolist()
+    }
+    # .tolist() yields native Python values, so rows are JSON-serializable
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    
+    # One batch load job: free, atomic, and immediately queryable, unlike
+    # streaming inserts which are billed per row and buffered
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+    )
+    
+    try:
+        job = client.load_table_from_json(rows, table_ref, job_config=job_config)
+        job.result()
+    except exceptions.GoogleAPICallError as e:
+        print(f"❌ Errors loading mock data: {getattr(e, 'errors', None) or e}")
     else:
-        print(f"✅ Inserted {len(rows)} mock metric entries")
+        print(f"✅ Loaded {job.output_rows} mock metric entries")
 
 
 def main():
@@ -156,6 +233,9 @@ def main():
     # Create metrics table
     create_metrics_table(client)
     
+    # Create the per-minute rollup read by detect_anomaly
+    create_rollup_view(client)
+    
     # Insert mock data
     print("\n📈 Loading mock data...")
     insert_mock_data(client)
@@ -163,7 +243,7 @@ def main():
     print("\n" + "=" * 60)
     print("✅ BigQuery setup complete!")
     print(f"\nQuery your data:")
-    print(f"  bq query --use_legacy_sql=false 'SELECT * FROM `{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}` LIMIT 10'")
+    print(f"  bq query --use_legacy_sql=false 'SELECT * FROM `{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}` WHERE timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 1 DAY) LIMIT 10'")
     print(f"\nOr in Console:")
     print(f"  https://console.cloud.google.com/bigquery?project={PROJECT_ID}&ws=!1m5!1m4!4m3!1s{PROJECT_ID}!2s{DATASET_ID}!3s{TABLE_ID}")
 